@@ -0,0 +1,133 @@
+"""
+The script is part of the TRON (ToRainOrNot) weather widget.
+
+Builds static assets for the browser client from config.images_dir
+into config.assets_dir:
+
+- icons are losslessly recompressed and copied with a content hash in
+  their filenames, so they can be cached by browsers forever;
+- all icons are also inlined as data URIs in a single fingerprinted
+  stylesheet, so the widget can load them with one request;
+- manifest.json maps original names to fingerprinted ones.
+
+Should be executed after icons have changed.
+"""
+import os
+import base64
+import hashlib
+import json
+import struct
+import zlib
+import config
+from precompress import write_precompressed
+
+
+png_signature = b'\x89PNG\r\n\x1a\n'
+"""First bytes of every PNG file."""
+
+png_kept_chunks = {b'IHDR', b'PLTE', b'tRNS', b'gAMA', b'cHRM', b'sRGB', b'iCCP', b'IDAT', b'IEND'}
+"""PNG chunks that affect how the image looks. All other chunks are dropped."""
+
+
+def read_png_chunks(data):
+    """
+    Split PNG file into chunks.
+    :param data: Content of PNG file
+    :return: List of (type, data) tuples
+    """
+    if not data.startswith(png_signature):
+        raise ValueError("Not a PNG file")
+
+    chunks = []
+    pos = len(png_signature)
+    while pos < len(data):
+        length, = struct.unpack('>I', data[pos:pos + 4])
+        type = data[pos + 4:pos + 8]
+        chunks.append((type, data[pos + 8:pos + 8 + length]))
+        pos += 12 + length
+    return chunks
+
+
+def write_png_chunk(type, data):
+    crc = zlib.crc32(type + data) & 0xffffffff
+    return struct.pack('>I', len(data)) + type + data + struct.pack('>I', crc)
+
+
+def optimize_png(data):
+    """
+    Losslessly shrink a PNG file by dropping metadata chunks and
+    recompressing image data with maximum compression.
+    :param data: Content of PNG file
+    :return: Content of optimized PNG file, or the original if it is not bigger
+    """
+    chunks = [(type, chunk) for type, chunk in read_png_chunks(data) if type in png_kept_chunks]
+
+    # Image data may be split in several IDAT chunks; join it in one
+    pixels = zlib.decompress(b''.join(chunk for type, chunk in chunks if type == b'IDAT'))
+    idat = zlib.compress(pixels, 9)
+
+    optimized = png_signature
+    for type, chunk in chunks:
+        if type != b'IDAT':
+            optimized += write_png_chunk(type, chunk)
+        elif idat:
+            optimized += write_png_chunk(type, idat)
+            idat = None
+
+    return optimized if len(optimized) < len(data) else data
+
+
+def fingerprint(filename, data):
+    """
+    Add hash of content to a filename, e.g. sun.png -> sun.1f2e3d4c5b.png
+    :param filename: Name of file
+    :param data: Content of file
+    :return: Fingerprinted filename
+    """
+    name, ext = os.path.splitext(filename)
+    return '%s.%s%s' % (name, hashlib.sha256(data).hexdigest()[:10], ext)
+
+
+def build(images_dir, assets_dir):
+    """
+    Build fingerprinted icons and stylesheet with inlined icons.
+    :param images_dir: Directory with source PNG icons
+    :param assets_dir: Directory to write built assets to
+    :return: Manifest, mapping original filenames to fingerprinted ones
+    """
+    os.makedirs(assets_dir, 0o755, True)
+
+    manifest = {}
+    css = ""
+    for filename in sorted(os.listdir(images_dir)):
+        if not filename.endswith('.png'):
+            continue
+
+        with open(os.path.join(images_dir, filename), 'rb') as f:
+            data = optimize_png(f.read())
+
+        manifest[filename] = fingerprint(filename, data)
+        with open(os.path.join(assets_dir, manifest[filename]), 'wb') as f:
+            f.write(data)
+
+        css += '.icon-%s{background-image:url(data:image/png;base64,%s)}\n' % (
+            os.path.splitext(filename)[0].replace('_', '-'),
+            base64.b64encode(data).decode('ascii'),
+        )
+
+    css = css.encode('utf-8')
+    manifest['icons.css'] = fingerprint('icons.css', css)
+    css_filename = os.path.join(assets_dir, manifest['icons.css'])
+    with open(css_filename, 'wb') as f:
+        f.write(css)
+    write_precompressed(css_filename)
+
+    with open(os.path.join(assets_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return manifest
+
+
+if __name__ == '__main__':
+    for original, built in sorted(build(config.images_dir, config.assets_dir).items()):
+        print('%s -> %s' % (original, os.path.join(config.assets_dir, built)))
@@ -12,3 +12,46 @@ locations_to_cache = [
     {"location": "София", "provider": "sinoptik"},
 ]
 """List of locations to cache data for. The names in this list should match the names used in provider."""
+
+request_timeout = 10
+"""Seconds to wait for upstream website to respond."""
+
+min_request_delay = 0.5
+"""Minimum delay in seconds between two requests to the same host."""
+
+max_request_delay = 30
+"""Maximum delay in seconds between two requests to the same host."""
+
+request_delay_step = 0.1
+"""Seconds to subtract from the delay after each fast and successful response."""
+
+request_delay_backoff = 2
+"""Factor to multiply the delay by after a slow or failed response."""
+
+slow_response_latency = 3
+"""Response time in seconds, above which the host is considered overloaded."""
+
+circuit_failure_threshold = 5
+"""Number of consecutive failed requests, after which requests to the host fail fast.
+Failures are counted in memory, so this only takes effect in long-running processes."""
+
+circuit_reset_timeout = 60
+"""Seconds to fail fast, before trying to reach a failing host again."""
+
+forecast_cache_ttl = 1800
+"""Seconds after which a forecast cached in memory is refreshed in background."""
+
+forecast_cache_max_stale = 10800
+"""Seconds after which a forecast cached in memory is too old to be served and is downloaded again."""
+
+forecast_cache_size = 100
+"""Maximum number of forecasts to keep in memory."""
+
+images_dir = "../browser/images/"
+"""path to directory with source icons of browser client."""
+
+assets_dir = "../browser/dist/"
+"""path to directory where built static assets of browser client should be stored."""
+
+recorded_pages_dir = "recorded/"
+"""path to directory with downloaded web pages, used to profile scripts offline with --dry-run."""
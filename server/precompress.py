@@ -0,0 +1,32 @@
+"""
+Helpers for writing compressed copies of files served to clients,
+shared by update_cache.py and build_assets.py.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def write_precompressed(filename):
+    """
+    Write gzip (and brotli, if installed) compressed copies of a file next to it,
+    so web servers can send them without compressing on every request.
+    :param filename: Path to file
+    :return: List of written files
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    written = [filename + '.gz']
+    with open(written[0], 'wb') as f:
+        f.write(gzip.compress(data, 9, mtime=0))
+
+    if brotli:
+        written.append(filename + '.br')
+        with open(written[1], 'wb') as f:
+            f.write(brotli.compress(data))
+
+    return written
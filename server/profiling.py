@@ -0,0 +1,88 @@
+"""
+Helpers for profiling TRON server scripts.
+
+Code that does a distinct part of the work wraps it in `stage(name)`.
+Running a script inside `profile(filename)` collects cProfile stats and
+wall-clock time spent in each stage, optionally peak memory usage, and
+prints a report when done.
+"""
+import cProfile
+import pstats
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+stage_times = OrderedDict()
+"""Wall-clock seconds spent in each stage, in order of first use."""
+
+
+@contextmanager
+def stage(name):
+    """
+    Measure wall-clock time of a block of code and add it to the stage's total.
+    Stages should not be nested, or time would be counted twice.
+    :param name: Name of stage, e.g. fetch, parse, lookup or write
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_times[name] = stage_times.get(name, 0) + time.perf_counter() - started
+
+
+@contextmanager
+def profile(filename, trace_memory=False, top=15):
+    """
+    Profile a block of code and print a report when it is done.
+    Stage timings include cProfile overhead. Memory tracing slows code down
+    much more, so it is off by default.
+    :param filename: Path to file where pstats dump should be stored
+    :param trace_memory: Trace memory allocations with tracemalloc
+    :param top: Number of functions and allocation sites to include in report
+    """
+    stage_times.clear()
+    if trace_memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        total = time.perf_counter() - started
+        peak, snapshot = None, None
+        if trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+        profiler.dump_stats(filename)
+        print_report(total, peak, snapshot, top)
+        pstats.Stats(filename).sort_stats('cumulative').print_stats(top)
+        print('Profile stats saved to %s' % filename)
+
+
+def print_report(total, peak, snapshot, top):
+    print("")
+    print("Wall-clock time by stage:")
+    print("-------------------------")
+    for name, seconds in stage_times.items():
+        print('%-10s %9.3f s %6.1f%%' % (name, seconds, 100 * seconds / total if total else 0))
+    other = total - sum(stage_times.values())
+    print('%-10s %9.3f s %6.1f%%' % ('other', other, 100 * other / total if total else 0))
+    print('%-10s %9.3f s' % ('total', total))
+    if snapshot:
+        print("Timings include overhead of cProfile and tracemalloc.")
+        print("")
+        print('Peak memory: %.1f KiB' % (peak / 1024))
+        print("")
+        print("Memory still allocated by top lines:")
+        print("------------------------------------")
+        for stat in snapshot.statistics('lineno')[:top]:
+            print(stat)
+    else:
+        print("Timings include overhead of cProfile.")
+    print("")
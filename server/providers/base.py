@@ -1,3 +1,20 @@
+import os
+import json
+from collections import OrderedDict
+
+from .cache import ForecastCache
+import config
+import profiling
+
+
+forecast_cache = ForecastCache(
+    ttl=config.forecast_cache_ttl,
+    max_stale=config.forecast_cache_max_stale,
+    max_size=config.forecast_cache_size,
+)
+"""Forecasts downloaded by all providers, keyed by (provider ID, location ID)."""
+
+
 class ProviderMetaClass(type):
     """Metaclass that registers all provider classes in a common
        list and create a singleton global object for each provider
@@ -24,18 +41,55 @@ class BaseWeatherProvider(metaclass=ProviderMetaClass):
         """
         raise NotImplementedError("Please, implement covers_location method")
 
-    def download_data(self, location_id=None, location_name=None):
+    def get_location_id_by_name(self, name):
+        """
+        Find the ID of a location by its human readable name.
+        :param name: Human readable name of location
+        :return: ID of location - specific for each provider
+        """
+        raise NotImplementedError("Please, implement get_location_id_by_name method")
+
+    def download_data(self, location_id=None, location_name=None, use_cache=True):
         """
-        Download weather data for a specified location by its ID or name.
+        Get weather data for a specified location by its ID or name.
+        Data is kept in the in-process forecast cache and downloaded only if
+        it has not been cached yet. Stale data is returned immediately and
+        refreshed in background.
         :param location_id: ID of location - specific for each provider
         :param location_name: Human readable name of location
+        :param use_cache: Use the forecast cache. Scripts that run once and exit,
+                          like update_cache.py, should pass False to always
+                          download fresh data.
         :return: Dictionary with hourly weather data in the following format:
                  {"HH:mm": [temperature, precipation_chance, precipation_intensity], "HH:mm": ...}
 
                  Dictionary may be ordered by hour. Example:
                  OrderedDict([('18:00', ('2°', '17%', '0.0 mm')), ('19:00', ...
         """
-        raise NotImplementedError("Please, implement download_data method")
+        if not location_id:
+            # Get location ID by name
+            with profiling.stage('lookup'):
+                location_id = self.get_location_id_by_name(location_name)
+
+        if not location_id:
+            raise ValueError("%s.download_data(): No location ID specified or location %r not found"
+                             % (self.__class__.__name__, location_name))
+
+        if not use_cache:
+            return self._download_data(location_id)
+
+        return forecast_cache.get(
+            (self.id, location_id),
+            lambda: self._download_data(location_id),
+        )
+
+    def _download_data(self, location_id):
+        """
+        Download weather data for a specified location from the website, bypassing the cache.
+        :param location_id: ID of location - specific for each provider
+        :return: Dictionary with hourly weather data in the format returned by download_data
+        """
+        raise NotImplementedError("Please, implement _download_data method")
 
     @classmethod
     def find_provider(cls, provider_id=None, location_name=None):
@@ -57,3 +111,41 @@ class BaseWeatherProvider(metaclass=ProviderMetaClass):
 
         return None
 
+    @classmethod
+    def warm_cache(cls, cache_dir, locations=None):
+        """
+        Load the latest forecasts cached on disk by update_cache.py into the
+        in-process forecast cache. Long-running processes should call it on
+        startup. Forecasts keep the time of their files, so old ones are
+        refreshed on first use.
+        :param cache_dir: Directory where update_cache.py writes data, usually config.cache_dir
+        :param locations: Locations to load. Defaults to config.locations_to_cache
+        """
+        if locations is None:
+            locations = config.locations_to_cache
+
+        for location in locations:
+            location_name = location["location"]
+            provider = cls.find_provider(provider_id=location["provider"], location_name=location_name)
+            if not provider or not provider.covers_location(location_name=location_name):
+                continue
+
+            dir = os.path.join(cache_dir, location_name)
+            if not os.path.isdir(dir):
+                continue
+
+            # Files are named by date, so the last one is the most recent
+            files = sorted(f for f in os.listdir(dir) if f.endswith('.json'))
+            if not files:
+                continue
+            filename = os.path.join(dir, files[-1])
+
+            try:
+                with open(filename) as f:
+                    data = json.load(f, object_pairs_hook=OrderedDict)
+            except ValueError:
+                # Skip broken files, data will be downloaded on first use
+                continue
+
+            key = (provider.id, provider.get_location_id_by_name(location_name))
+            forecast_cache.put(key, data, stored_at=os.path.getmtime(filename))
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+log = logging.getLogger(__name__)
+
+
+class ForecastCache:
+    """
+    In-process cache of downloaded forecasts with TTL and LRU eviction.
+
+    Entries older than `ttl` seconds are stale: they are still returned
+    immediately, while a fresh copy is downloaded in a background thread
+    (stale-while-revalidate). Entries older than `max_stale` seconds are
+    too old to be served: they are dropped and downloaded again, while the
+    caller waits.
+    """
+
+    def __init__(self, ttl, max_stale, max_size, clock=time.time):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_size = max_size
+        self.clock = clock
+        self.entries = OrderedDict()
+        """Cached forecasts as {key: (data, stored_at)}, least recently used first."""
+        self.refreshing = set()
+        """Keys currently being refreshed in background."""
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def put(self, key, data, stored_at=None):
+        """
+        Store a forecast, evicting the least recently used ones if cache is full.
+        :param key: Tuple of (provider ID, location ID)
+        :param data: Forecast data
+        :param stored_at: Time when data was downloaded. Defaults to now.
+        """
+        if stored_at is None:
+            stored_at = self.clock()
+        with self.lock:
+            self.entries[key] = (data, stored_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get(self, key, load):
+        """
+        Get forecast from cache, downloading it with `load` if missing.
+        Stale forecasts are returned as they are and refreshed in background,
+        unless they are older than max_stale.
+        :param key: Tuple of (provider ID, location ID)
+        :param load: Function without arguments that downloads the forecast
+        :return: Forecast data
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                data, stored_at = entry
+                age = self.clock() - stored_at
+                if age <= self.max_stale:
+                    self.entries.move_to_end(key)
+                    if age > self.ttl and key not in self.refreshing:
+                        self.refreshing.add(key)
+                        threading.Thread(target=self.refresh, args=(key, load), daemon=True).start()
+                    return data
+
+                # Too old to be served as current forecast
+                del self.entries[key]
+
+        data = load()
+        self.put(key, data)
+        return data
+
+    def refresh(self, key, load):
+        """Download a forecast and store it. On failure the stale forecast is kept."""
+        try:
+            self.put(key, load())
+        except Exception:
+            log.warning("Could not refresh forecast for %s, keeping stale data", key, exc_info=True)
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -1,12 +1,12 @@
+import argparse
 import datetime
-import time
+from contextlib import nullcontext
 from collections import OrderedDict
-import requests
-from lxml import html
 
 from .base import BaseWeatherProvider
 from . import utils
 import config
+import profiling
 
 
 class SinoptikProvider(BaseWeatherProvider):
@@ -37,7 +37,7 @@ class SinoptikProvider(BaseWeatherProvider):
 
     def get_location_id_by_name(self, name):
         location = self.get_location_by_name(name)
-        return location['id']
+        return location['id'] if location else None
 
     def covers_location(self, location_id=None, location_name=None):
         """
@@ -54,11 +54,10 @@ class SinoptikProvider(BaseWeatherProvider):
 
         return False
 
-    def download_data(self, location_id=None, location_name=None):
+    def _download_data(self, location_id):
         """
-        Download weather data for a specified location by its ID or name.
+        Download weather data for a specified location from sinoptik website.
         :param location_id: ID of location - specific for each provider
-        :param location_name: Human readable name of location
         :return: Dictionary with hourly weather data in the following format:
                  {"HH:mm": [temperature, precipation_chance, precipation_intensity], "HH:mm": ...}
 
@@ -68,27 +67,21 @@ class SinoptikProvider(BaseWeatherProvider):
 
         now = datetime.datetime.now()
 
-        if not location_id:
-            # Get location ID by name
-            location_id = self.get_location_id_by_name(location_name)
-
-        if not location_id:
-            raise ValueError("SinoptikProvider.download_data(): No location ID specified")
-
         # Retrieve HTML of hourly web page for that location
         url = self.hourly_url % location_id
         doc = utils.get_html(url)
 
-        # Parse HTML and extract the weather data we need
-        temp = doc.xpath('.//span[contains(@class, \'max-temp\')]/text()')
-        rain_probability = doc.xpath('.//p[starts-with(text(),"Вероятност за валежи:")]/b/text()')
-        rain_intensity = doc.xpath('.//p[starts-with(text(),"Количество валежи:")]/b/text()')
+        with profiling.stage('parse'):
+            # Parse HTML and extract the weather data we need
+            temp = doc.xpath('.//span[contains(@class, \'max-temp\')]/text()')
+            rain_probability = doc.xpath('.//p[starts-with(text(),"Вероятност за валежи:")]/b/text()')
+            rain_intensity = doc.xpath('.//p[starts-with(text(),"Количество валежи:")]/b/text()')
 
-        # Group data by hour
-        hour = int(now.strftime("%H"))
-        hours = [str((hour + i) % 24) + ':00' for i in range(24)]
-        rain = zip(temp, rain_probability, rain_intensity)
-        data = OrderedDict(zip(hours, rain))
+            # Group data by hour
+            hour = int(now.strftime("%H"))
+            hours = [str((hour + i) % 24) + ':00' for i in range(24)]
+            rain = zip(temp, rain_probability, rain_intensity)
+            data = OrderedDict(zip(hours, rain))
 
         return data
 
@@ -115,11 +108,8 @@ class SinoptikProvider(BaseWeatherProvider):
                 'X-Requested-With': "XMLHttpRequest",
                 'Referrer': "http://sinoptik.bg/locations/europe/bulgaria",
             }
-            page = requests.get(url, headers=headers).text
-            doc = html.fromstring(page)
-
-            # Pretend it's a human clicking on letters
-            time.sleep(0.5)
+            # Requests are paced by utils, as if a human clicks on letters
+            doc = utils.get_html(url, headers)
 
             # Parse HTML and extract location IDs
             """This is how HTML looks like (whitespace reformatted):
@@ -135,20 +125,21 @@ class SinoptikProvider(BaseWeatherProvider):
                 </div>
             </div>
             """
-            anchors = doc.xpath('.//div[contains(@class, \'worldContent\')]/div/ul/li/a')
-            for a in anchors:
-                name = a.text.strip()
-                href = a.get('href')
-                id = href.rsplit('/', 1)[-1]
+            with profiling.stage('parse'):
+                anchors = doc.xpath('.//div[contains(@class, \'worldContent\')]/div/ul/li/a')
+                for a in anchors:
+                    name = a.text.strip()
+                    href = a.get('href')
+                    id = href.rsplit('/', 1)[-1]
 
-                # Add data for this location
-                loc = OrderedDict()
-                loc['name'] = name
-                loc['id'] = id
+                    # Add data for this location
+                    loc = OrderedDict()
+                    loc['name'] = name
+                    loc['id'] = id
 
-                self.locations.append(loc)
+                    self.locations.append(loc)
 
-                locations_str += "{'name': \"%s\", 'id': \"%s\"},\n" % (name, id)
+                    locations_str += "{'name': \"%s\", 'id': \"%s\"},\n" % (name, id)
 
         return locations_str
 
@@ -460,23 +451,41 @@ class SinoptikProvider(BaseWeatherProvider):
 
 
 if __name__ == '__main__':
-    sinoptik = SinoptikProvider()
-    locations_str = sinoptik.download_locations()
-
-    print("Sinoptik locations:")
-    print("-------------------")
-    print(locations_str)
-    print("")
-
-    print("Downloaded data for Велико Търново:")
-    print("-----------------------------------")
-    data = sinoptik.download_data(location_name="Велико Търново")
-    print(data)
-
-    print("Find provider by id:")
-    print("--------------------")
-    print(SinoptikProvider.find_provider(provider_id="sinoptik"))
-
-    print("Find provider by location name:")
-    print("----------------------")
-    print(SinoptikProvider.find_provider(location_name="Велико Търново"))
+    parser = argparse.ArgumentParser(description="Download locations and sample weather data from sinoptik.")
+    parser.add_argument('--profile', nargs='?', const='sinoptik.pstats', metavar='FILE',
+                        help="profile the run and save pstats dump to FILE (default: %(const)s)")
+    parser.add_argument('--memory', action='store_true',
+                        help="with --profile, also trace memory allocations (slows down the run)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="read pages from config.recorded_pages_dir instead of downloading them")
+    parser.add_argument('--record', action='store_true',
+                        help="save downloaded pages to config.recorded_pages_dir for later --dry-run")
+    args = parser.parse_args()
+
+    utils.replay_pages = args.dry_run
+    utils.record_pages = args.record
+
+    try:
+        with profiling.profile(args.profile, args.memory) if args.profile else nullcontext():
+            sinoptik = SinoptikProvider()
+            locations_str = sinoptik.download_locations()
+
+            print("Sinoptik locations:")
+            print("-------------------")
+            print(locations_str)
+            print("")
+
+            print("Downloaded data for Велико Търново:")
+            print("-----------------------------------")
+            data = sinoptik.download_data(location_name="Велико Търново", use_cache=False)
+            print(data)
+
+            print("Find provider by id:")
+            print("--------------------")
+            print(SinoptikProvider.find_provider(provider_id="sinoptik"))
+
+            print("Find provider by location name:")
+            print("----------------------")
+            print(SinoptikProvider.find_provider(location_name="Велико Търново"))
+    except utils.RecordedPageMissingError as e:
+        parser.exit(1, "%s\n" % e)
@@ -1,14 +1,280 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse, quote
 import requests
 from lxml import html
 import config
+import profiling
 
 
-def get_html(url):
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+    def __init__(self, host, retry_after=None):
+        if retry_after is None:
+            message = "Circuit for %s is half-open, waiting for a trial request to complete" % host
+        else:
+            message = "Circuit for %s is open, retry in %.1f s" % (host, retry_after)
+        super().__init__(message)
+        self.host = host
+        self.retry_after = retry_after
+
+
+class RecordedPageMissingError(Exception):
+    """Raised when replaying recorded pages and the requested page has not been recorded."""
+
+    def __init__(self, url):
+        super().__init__("No recorded page for %s, run once with --record to save it" % url)
+        self.url = url
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a host after several consecutive failures.
+
+    The circuit opens after `failure_threshold` failures in a row and stays
+    open for `reset_timeout` seconds, during which requests fail fast.
+    After that a single trial request is let through (half-open state),
+    while other requests keep failing fast until it completes:
+    success closes the circuit, failure opens it again.
+
+    State lives in memory only, so the breaker helps long-running processes.
+    A short script like update_cache.py, sending one request per location,
+    exits before the circuit could open.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.RLock()
+
+    def retry_after(self):
+        """
+        :return: Seconds left until the circuit allows a trial request
+        """
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0
+            return max(0, self.opened_at + self.reset_timeout - self.clock())
+
+    def allow_request(self):
+        """
+        Check if a request may be sent, moving an expired open circuit to half-open.
+        :return: True if the request may be sent
+        """
+        with self.lock:
+            if self.state == self.OPEN:
+                if self.retry_after() > 0:
+                    return False
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self.trial_in_flight:
+                    return False
+                self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.trial_in_flight = False
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def release_trial(self):
+        """Let another trial request through, when a trial ended without a response."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.trial_in_flight = False
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+class RateController:
+    """
+    Paces requests to a host with AIMD (additive increase, multiplicative decrease).
+
+    Each fast, successful response shortens the delay between requests by
+    `step`, down to `min_delay`. Slow responses, throttling (429), server
+    errors and connection errors multiply the delay by `backoff`, up to `max_delay`.
+    """
+
+    def __init__(self, min_delay, max_delay, step, backoff, slow_latency,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.step = step
+        self.backoff = backoff
+        self.slow_latency = slow_latency
+        self.clock = clock
+        self.sleep = sleep
+        self.delay = min_delay
+        self.last_request = None
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """
+        Sleep until the current delay since the previous request has passed.
+        The time slot is reserved before sleeping, so concurrent callers
+        are spaced out one after another.
+        """
+        with self.lock:
+            now = self.clock()
+            if self.last_request is None:
+                self.last_request = now
+            else:
+                self.last_request = max(now, self.last_request + self.delay)
+            remaining = self.last_request - now
+        if remaining > 0:
+            self.sleep(remaining)
+
+    def record_success(self, latency):
+        if latency > self.slow_latency:
+            self.record_failure()
+        else:
+            with self.lock:
+                self.delay = max(self.min_delay, self.delay - self.step)
+
+    def record_failure(self):
+        with self.lock:
+            self.delay = min(self.max_delay, max(self.delay, self.step) * self.backoff)
+
+
+_breakers = {}
+"""Circuit breaker of each host, keyed by host name."""
+
+_rate_controllers = {}
+"""Rate controller of each host, keyed by host name."""
+
+_hosts_lock = threading.Lock()
+"""Guards _breakers and _rate_controllers, as forecasts may be refreshed in background threads."""
+
+
+def get_circuit_breaker(host):
+    with _hosts_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(
+                failure_threshold=config.circuit_failure_threshold,
+                reset_timeout=config.circuit_reset_timeout,
+            )
+        return _breakers[host]
+
+
+def get_rate_controller(host):
+    with _hosts_lock:
+        if host not in _rate_controllers:
+            _rate_controllers[host] = RateController(
+                min_delay=config.min_request_delay,
+                max_delay=config.max_request_delay,
+                step=config.request_delay_step,
+                backoff=config.request_delay_backoff,
+                slow_latency=config.slow_response_latency,
+            )
+        return _rate_controllers[host]
+
+
+replay_pages = False
+"""If True, pages are read from config.recorded_pages_dir instead of being downloaded."""
+
+record_pages = False
+"""If True, downloaded pages are also saved to config.recorded_pages_dir."""
+
+
+def get_recorded_page_filename(url):
+    """
+    :param url: URL to web page
+    :return: Path to file where the page is recorded
+    """
+    return os.path.join(config.recorded_pages_dir, quote(url, safe='') + '.html')
+
+
+def get_page(url, headers=None):
+    """
+    Download the text of a specific URL, or read it from recorded pages
+    if replay_pages is set.
+    :param url: URL to web page
+    :param headers: Request headers. Defaults to mobile user agent.
+    :return: Page text
+    :raise CircuitOpenError: If the circuit for that host is open
+    :raise requests.RequestException: On connection error, 429 or 5xx response
+    :raise RecordedPageMissingError: If replaying pages and the page has not been recorded
+    """
+    with profiling.stage('fetch'):
+        if replay_pages:
+            try:
+                with open(get_recorded_page_filename(url), encoding='utf-8') as f:
+                    return f.read()
+            except FileNotFoundError:
+                raise RecordedPageMissingError(url) from None
+
+        text = download_page(url, headers)
+
+        if record_pages:
+            os.makedirs(config.recorded_pages_dir, 0o755, True)
+            with open(get_recorded_page_filename(url), 'w', encoding='utf-8') as f:
+                f.write(text)
+
+        return text
+
+
+def download_page(url, headers):
+    """
+    Download the text of a specific URL, pacing requests and failing fast
+    if the host is known to be down. Parameters are the same as for get_page.
+    """
+    if headers is None:
+        headers = {'User-Agent': config.mobile_user_agent}
+
+    host = urlparse(url).netloc
+    breaker = get_circuit_breaker(host)
+    rate = get_rate_controller(host)
+
+    if not breaker.allow_request():
+        with breaker.lock:
+            retry_after = breaker.retry_after() if breaker.state == breaker.OPEN else None
+        raise CircuitOpenError(host, retry_after)
+
+    try:
+        rate.wait()
+        started = time.monotonic()
+        response = requests.get(url, headers=headers, timeout=config.request_timeout)
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+    except requests.RequestException:
+        breaker.record_failure()
+        rate.record_failure()
+        raise
+    except BaseException:
+        # Not a failure of the host, e.g. interrupted by user,
+        # but a half-open circuit should not wait for this trial forever
+        breaker.release_trial()
+        raise
+
+    breaker.record_success()
+    rate.record_success(time.monotonic() - started)
+    return response.text
+
+
+def get_html(url, headers=None):
     """
     Download the HTML of a specific URL and returns a document object.
     :param url: URL to web page
+    :param headers: Request headers. Defaults to mobile user agent.
     :return: Document object
     """
-    headers = {'User-Agent': config.mobile_user_agent}
-    page = requests.get(url, headers=headers).text
-    return html.fromstring(page)
+    page = get_page(url, headers)
+    with profiling.stage('parse'):
+        return html.fromstring(page)
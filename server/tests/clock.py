@@ -0,0 +1,11 @@
+class FakeClock:
+    """Clock for tests, which moves only when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
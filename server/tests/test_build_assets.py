@@ -0,0 +1,58 @@
+import unittest
+import logging
+import sys
+import os
+import json
+import tempfile
+import zlib
+
+import build_assets
+import config
+
+
+class TestBuildAssets(unittest.TestCase):
+    """
+    Tests for static assets pipeline of browser client
+    """
+
+    def test_optimize_png(self):
+        for filename in os.listdir(config.images_dir):
+            if not filename.endswith('.png'):
+                continue
+
+            with open(os.path.join(config.images_dir, filename), 'rb') as f:
+                original = f.read()
+            optimized = build_assets.optimize_png(original)
+            self.assertLessEqual(len(optimized), len(original))
+
+            # Image header and pixels should stay the same
+            def image(data):
+                chunks = build_assets.read_png_chunks(data)
+                header = next(chunk for type, chunk in chunks if type == b'IHDR')
+                pixels = zlib.decompress(b''.join(chunk for type, chunk in chunks if type == b'IDAT'))
+                return header, pixels
+            self.assertEqual(image(optimized), image(original))
+
+    def test_fingerprint(self):
+        self.assertEqual(build_assets.fingerprint('sun.png', b'a'), 'sun.ca978112ca.png')
+        self.assertNotEqual(build_assets.fingerprint('sun.png', b'a'),
+                            build_assets.fingerprint('sun.png', b'b'))
+
+    def test_build(self):
+        with tempfile.TemporaryDirectory() as dir:
+            manifest = build_assets.build(config.images_dir, dir)
+            self.assertIn('sun.png', manifest)
+            self.assertIn('icons.css', manifest)
+            for filename in manifest.values():
+                self.assertTrue(os.path.isfile(os.path.join(dir, filename)))
+
+            with open(os.path.join(dir, manifest['icons.css'])) as f:
+                self.assertIn('.icon-take-umbrella{', f.read())
+
+            with open(os.path.join(dir, 'manifest.json')) as f:
+                self.assertEqual(json.load(f), manifest)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    unittest.main()
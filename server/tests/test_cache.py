@@ -0,0 +1,94 @@
+import unittest
+import logging
+import sys
+import threading
+import time
+
+from providers.cache import ForecastCache
+from tests.clock import FakeClock
+
+
+class TestForecastCache(unittest.TestCase):
+    """
+    Tests for in-process forecast cache
+    """
+
+    def test_get_downloads_once(self):
+        cache = ForecastCache(ttl=60, max_stale=600, max_size=10, clock=FakeClock())
+        calls = []
+
+        def load():
+            calls.append(1)
+            return {"10:00": ["6°", "3%", "0.0 mm"]}
+
+        self.assertEqual(cache.get(("sinoptik", "sofia"), load), {"10:00": ["6°", "3%", "0.0 mm"]})
+        self.assertEqual(cache.get(("sinoptik", "sofia"), load), {"10:00": ["6°", "3%", "0.0 mm"]})
+        self.assertEqual(len(calls), 1)
+
+    def test_lru_eviction(self):
+        cache = ForecastCache(ttl=60, max_stale=600, max_size=2, clock=FakeClock())
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a", lambda: None)
+        cache.put("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_stale_while_revalidate(self):
+        clock = FakeClock()
+        cache = ForecastCache(ttl=60, max_stale=600, max_size=10, clock=clock)
+        cache.put("a", "old")
+        clock.now = 61
+
+        loaded = threading.Event()
+
+        def load():
+            loaded.set()
+            return "new"
+
+        self.assertEqual(cache.get("a", load), "old")
+        self.assertTrue(loaded.wait(5))
+        for i in range(500):
+            if not cache.refreshing:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get("a", load), "new")
+
+    def test_failed_refresh_keeps_stale_data(self):
+        clock = FakeClock()
+        cache = ForecastCache(ttl=60, max_stale=600, max_size=10, clock=clock)
+        cache.put("a", "old")
+        clock.now = 61
+
+        def load():
+            raise IOError("Website is down")
+
+        with self.assertLogs('providers.cache', level='WARNING'):
+            cache.refresh("a", load)
+        self.assertFalse(cache.refreshing)
+        self.assertEqual(cache.entries["a"], ("old", 0))
+
+    def test_max_stale(self):
+        clock = FakeClock()
+        cache = ForecastCache(ttl=60, max_stale=600, max_size=10, clock=clock)
+        cache.put("a", "old")
+        clock.now = 601
+
+        # Data too old to be served is downloaded again, while caller waits
+        self.assertEqual(cache.get("a", lambda: "new"), "new")
+        self.assertFalse(cache.refreshing)
+
+        def load():
+            raise IOError("Website is down")
+
+        clock.now = 1202
+        with self.assertRaises(IOError):
+            cache.get("a", load)
+        self.assertNotIn("a", cache)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    unittest.main()
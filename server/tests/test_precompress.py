@@ -0,0 +1,31 @@
+import unittest
+import logging
+import sys
+import os
+import gzip
+import json
+import tempfile
+
+import precompress
+
+
+class TestPrecompress(unittest.TestCase):
+    """
+    Tests for writing compressed copies of files
+    """
+
+    def test_write_precompressed(self):
+        with tempfile.TemporaryDirectory() as dir:
+            filename = os.path.join(dir, '20180101.json')
+            with open(filename, 'w') as f:
+                json.dump({"10:00": ["6°", "3%", "0.0 mm"]}, f)
+
+            written = precompress.write_precompressed(filename)
+            self.assertIn(filename + '.gz', written)
+            with open(filename, 'rb') as f, gzip.open(filename + '.gz') as gz:
+                self.assertEqual(gz.read(), f.read())
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    unittest.main()
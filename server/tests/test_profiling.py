@@ -0,0 +1,53 @@
+import unittest
+import logging
+import sys
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+
+import profiling
+
+
+class TestProfiling(unittest.TestCase):
+    """
+    Tests for profiling helpers
+    """
+
+    def test_stage(self):
+        profiling.stage_times.clear()
+        for i in range(2):
+            with profiling.stage('parse'):
+                pass
+        with profiling.stage('write'):
+            pass
+        self.assertEqual(list(profiling.stage_times), ['parse', 'write'])
+        self.assertTrue(all(seconds >= 0 for seconds in profiling.stage_times.values()))
+
+    def test_profile(self):
+        with tempfile.TemporaryDirectory() as dir:
+            filename = os.path.join(dir, 'test.pstats')
+            output = io.StringIO()
+            with redirect_stdout(output):
+                with profiling.profile(filename):
+                    with profiling.stage('fetch'):
+                        data = [str(i) for i in range(1000)]
+            self.assertTrue(os.path.isfile(filename))
+
+        report = output.getvalue()
+        self.assertIn('fetch', report)
+        self.assertNotIn('Peak memory', report)
+        self.assertIn('Profile stats saved to', report)
+
+    def test_profile_memory(self):
+        with tempfile.TemporaryDirectory() as dir:
+            output = io.StringIO()
+            with redirect_stdout(output):
+                with profiling.profile(os.path.join(dir, 'test.pstats'), trace_memory=True):
+                    data = [str(i) for i in range(1000)]
+        self.assertIn('Peak memory', output.getvalue())
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    unittest.main()
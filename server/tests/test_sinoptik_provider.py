@@ -1,7 +1,12 @@
 import unittest
 import logging
 import sys
+import os
+import json
+import tempfile
+from unittest import mock
 
+from providers import base
 from providers.base import BaseWeatherProvider
 from providers.sinoptik import SinoptikProvider
 
@@ -19,6 +24,65 @@ class TestSinoptikProvider(unittest.TestCase):
         provider = BaseWeatherProvider.find_provider(location_name="Велико Търново")
         self.assertEqual(provider.__class__.__name__, 'SinoptikProvider')
 
+    def test_warm_cache(self):
+        base.forecast_cache.clear()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dir = os.path.join(cache_dir, "Велико Търново")
+            os.makedirs(dir)
+            for day, temp in (("20180101", "1°"), ("20180102", "2°")):
+                with open(os.path.join(dir, "%s.json" % day), "w") as f:
+                    json.dump({"10:00": [temp, "3%", "0.0 mm"]}, f)
+
+            BaseWeatherProvider.warm_cache(cache_dir, [
+                {"location": "There is no such place", "provider": "sinoptik"},
+                {"location": "Велико Търново", "provider": "sinoptik"},
+                {"location": "София", "provider": "sinoptik"},
+            ])
+
+        key = ("sinoptik", "veliko-turnovo-bulgaria-100725993")
+        self.assertIn(key, base.forecast_cache)
+        self.assertEqual(len(base.forecast_cache), 1)
+
+        # Cached data is returned without accessing sinoptik website
+        ttl = base.forecast_cache.ttl
+        base.forecast_cache.ttl = float("inf")
+        try:
+            sinoptik = BaseWeatherProvider.find_provider(provider_id="sinoptik")
+            data = sinoptik.download_data(location_name="Велико Търново")
+            self.assertEqual(data, {"10:00": ["2°", "3%", "0.0 mm"]})
+        finally:
+            base.forecast_cache.ttl = ttl
+            base.forecast_cache.clear()
+
+    def test_download_data_is_cached(self):
+        base.forecast_cache.clear()
+        sinoptik = BaseWeatherProvider.find_provider(provider_id="sinoptik")
+        data = {"10:00": ["6°", "3%", "0.0 mm"]}
+        with mock.patch.object(sinoptik, '_download_data', return_value=data) as download:
+            try:
+                self.assertEqual(sinoptik.download_data(location_name="Велико Търново"), data)
+                self.assertEqual(sinoptik.download_data(location_id="veliko-turnovo-bulgaria-100725993"), data)
+            finally:
+                base.forecast_cache.clear()
+        download.assert_called_once_with("veliko-turnovo-bulgaria-100725993")
+
+    def test_download_data_without_cache(self):
+        base.forecast_cache.clear()
+        sinoptik = BaseWeatherProvider.find_provider(provider_id="sinoptik")
+        base.forecast_cache.put((sinoptik.id, "veliko-turnovo-bulgaria-100725993"), {"10:00": ["1°", "3%", "0.0 mm"]})
+        data = {"10:00": ["6°", "3%", "0.0 mm"]}
+        with mock.patch.object(sinoptik, '_download_data', return_value=data) as download:
+            try:
+                self.assertEqual(sinoptik.download_data(location_name="Велико Търново", use_cache=False), data)
+            finally:
+                base.forecast_cache.clear()
+        download.assert_called_once_with("veliko-turnovo-bulgaria-100725993")
+
+    def test_download_data_with_invalid_location_name(self):
+        sinoptik = BaseWeatherProvider.find_provider(provider_id="sinoptik")
+        with self.assertRaises(ValueError):
+            sinoptik.download_data(location_name="There is no such place")
+
     @unittest.skip("Skipping test, requiring access to sinoptik website")
     def test_download_data(self):
         log = logging.getLogger("TestSinoptikProvider.test_download_data")
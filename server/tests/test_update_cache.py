@@ -0,0 +1,113 @@
+import unittest
+import logging
+import sys
+import io
+import os
+import datetime
+import json
+import tempfile
+from contextlib import redirect_stdout
+from unittest import mock
+
+import requests
+import config
+import profiling
+import update_cache
+from providers import utils
+from providers.base import BaseWeatherProvider
+from providers.utils import CircuitOpenError
+
+
+class TestUpdateCache(unittest.TestCase):
+    """
+    Tests for update_cache script
+    """
+
+    location_name = "Велико Търново"
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.cache_dir.name, self.location_name)
+        os.makedirs(self.dir)
+        self.today = os.path.join(self.dir, '%s.json' % datetime.datetime.now().strftime('%Y%m%d'))
+        self.sinoptik = BaseWeatherProvider.find_provider(provider_id="sinoptik")
+        patcher = mock.patch.object(config, 'locations_to_cache',
+                                    [{"location": self.location_name, "provider": "sinoptik"}])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def run_update(self, **kwargs):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            update_cache.update_cache(self.cache_dir.name, **kwargs)
+        return output.getvalue()
+
+    def test_serve_stale_forecast(self):
+        yesterday = os.path.join(self.dir, '20000101.json')
+        with open(yesterday, 'w') as f:
+            json.dump({"10:00": ["1°", "3%", "0.0 mm"]}, f)
+        os.utime(yesterday, (946713600, 946713600))
+
+        for error in (requests.ConnectionError("Website is down"), CircuitOpenError("m.sinoptik.bg", 60)):
+            with mock.patch.object(self.sinoptik, '_download_data', side_effect=error):
+                output = self.run_update()
+            self.assertIn('Serving last cached forecast', output)
+
+            with open(self.today) as f:
+                self.assertEqual(json.load(f), {"10:00": ["1°", "3%", "0.0 mm"]})
+            self.assertEqual(os.path.getmtime(self.today), 946713600)
+            self.assertTrue(os.path.isfile(self.today + '.gz'))
+            self.assertTrue(os.path.isfile(self.today + '.stale'))
+
+        # Stale data is downloaded again on next run
+        data = {"10:00": ["6°", "3%", "0.0 mm"]}
+        with mock.patch.object(self.sinoptik, '_download_data', return_value=data):
+            output = self.run_update()
+        self.assertIn('Cached data', output)
+        with open(self.today) as f:
+            self.assertEqual(json.load(f), data)
+        self.assertFalse(os.path.isfile(self.today + '.stale'))
+
+    def test_nothing_to_serve(self):
+        with mock.patch.object(self.sinoptik, '_download_data', side_effect=requests.ConnectionError("down")):
+            output = self.run_update()
+        self.assertIn('Could not download data', output)
+        self.assertNotIn('Serving', output)
+        self.assertFalse(os.path.exists(self.today))
+
+    def test_replay_recorded_pages(self):
+        recorded_pages_dir = config.recorded_pages_dir
+        utils.replay_pages = True
+        try:
+            with tempfile.TemporaryDirectory() as dir:
+                config.recorded_pages_dir = dir
+                url = self.sinoptik.hourly_url % "veliko-turnovo-bulgaria-100725993"
+                with open(utils.get_recorded_page_filename(url), 'w', encoding='utf-8') as f:
+                    f.write('<html><body>' + '<span class="max-temp">6°</span>'
+                            '<p>Вероятност за валежи: <b>3%</b></p>'
+                            '<p>Количество валежи: <b>0.0 mm</b></p>' * 24 + '</body></html>')
+
+                # Data cached today is downloaded again, when forced
+                with open(self.today, 'w') as f:
+                    json.dump({}, f)
+                profiling.stage_times.clear()
+                output = self.run_update(force=True)
+                self.assertIn('Cached data', output)
+                self.assertIn('fetch', profiling.stage_times)
+                self.assertIn('parse', profiling.stage_times)
+                self.assertIn('write', profiling.stage_times)
+                with open(self.today) as f:
+                    self.assertEqual(len(json.load(f)), 24)
+
+                os.remove(utils.get_recorded_page_filename(url))
+                output = self.run_update(force=True)
+                self.assertIn('No recorded page for %s, run once with --record' % url, output)
+        finally:
+            config.recorded_pages_dir = recorded_pages_dir
+            utils.replay_pages = False
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    unittest.main()
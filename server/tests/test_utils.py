@@ -1,7 +1,12 @@
 import unittest
 import logging
 import sys
+import os
+import tempfile
+from unittest import mock
 from providers import utils
+from tests.clock import FakeClock
+import config
 
 
 class TestUtils(unittest.TestCase):
@@ -18,6 +23,128 @@ class TestUtils(unittest.TestCase):
         body = html.xpath('.//body')
         self.assertTrue(len(body) >= 1 and body[0].tag == "body")
 
+    def test_replay_recorded_page(self):
+        url = "http://m.sinoptik.bg/sofia-bulgaria-100727011/hourly"
+        recorded_pages_dir = config.recorded_pages_dir
+        with tempfile.TemporaryDirectory() as dir:
+            config.recorded_pages_dir = dir
+            utils.replay_pages = True
+            try:
+                with open(utils.get_recorded_page_filename(url), 'w', encoding='utf-8') as f:
+                    f.write("<html><body><p>София</p></body></html>")
+                doc = utils.get_html(url)
+            finally:
+                config.recorded_pages_dir = recorded_pages_dir
+                utils.replay_pages = False
+        self.assertEqual(doc.xpath('.//p/text()'), ["София"])
+
+    def test_replay_missing_page(self):
+        recorded_pages_dir = config.recorded_pages_dir
+        with tempfile.TemporaryDirectory() as dir:
+            config.recorded_pages_dir = dir
+            utils.replay_pages = True
+            try:
+                with self.assertRaises(utils.RecordedPageMissingError):
+                    utils.get_page("http://m.sinoptik.bg/sofia-bulgaria-100727011/hourly")
+            finally:
+                config.recorded_pages_dir = recorded_pages_dir
+                utils.replay_pages = False
+
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    Tests for utils.CircuitBreaker
+    """
+
+    def test_opens_after_threshold(self):
+        clock = FakeClock()
+        breaker = utils.CircuitBreaker(failure_threshold=3, reset_timeout=60, clock=clock)
+        for i in range(2):
+            breaker.record_failure()
+            self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.retry_after(), 60)
+
+    def test_half_open_after_timeout(self):
+        clock = FakeClock()
+        breaker = utils.CircuitBreaker(failure_threshold=1, reset_timeout=60, clock=clock)
+        breaker.record_failure()
+        clock.now = 61
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, utils.CircuitBreaker.HALF_OPEN)
+
+        # Only one trial request is let through at a time
+        self.assertFalse(breaker.allow_request())
+
+        # A failed trial request opens the circuit again
+        breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+
+        clock.now = 122
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, utils.CircuitBreaker.CLOSED)
+
+    def test_trial_released_on_unexpected_error(self):
+        host = "breaker-test.invalid"
+        url = "http://%s/" % host
+        clock = FakeClock()
+        breaker = utils.CircuitBreaker(failure_threshold=1, reset_timeout=60, clock=clock)
+        utils._breakers[host] = breaker
+        utils._rate_controllers[host] = utils.RateController(
+            min_delay=0, max_delay=0, step=0, backoff=1, slow_latency=3, clock=clock, sleep=clock.sleep)
+        try:
+            breaker.record_failure()
+            clock.now = 61
+
+            with mock.patch('requests.get', side_effect=RuntimeError("Unexpected")):
+                with self.assertRaises(RuntimeError):
+                    utils.download_page(url, None)
+
+            # Next request is let through as a new trial
+            self.assertTrue(breaker.allow_request())
+            with self.assertRaisesRegex(utils.CircuitOpenError, "half-open"):
+                utils.download_page(url, None)
+        finally:
+            del utils._breakers[host]
+            del utils._rate_controllers[host]
+
+
+class TestRateController(unittest.TestCase):
+    """
+    Tests for utils.RateController
+    """
+
+    def create_controller(self, clock):
+        return utils.RateController(min_delay=0.5, max_delay=4, step=0.1, backoff=2,
+                                    slow_latency=3, clock=clock, sleep=clock.sleep)
+
+    def test_aimd(self):
+        rate = self.create_controller(FakeClock())
+        rate.record_failure()
+        self.assertEqual(rate.delay, 1)
+        rate.record_success(latency=5)
+        self.assertEqual(rate.delay, 2)
+        for i in range(5):
+            rate.record_failure()
+        self.assertEqual(rate.delay, 4)
+        for i in range(100):
+            rate.record_success(latency=0.1)
+        self.assertEqual(rate.delay, 0.5)
+
+    def test_wait(self):
+        clock = FakeClock()
+        rate = self.create_controller(clock)
+        rate.wait()
+        self.assertEqual(clock.now, 0)
+        rate.wait()
+        self.assertEqual(clock.now, 0.5)
+        clock.now = 10
+        rate.wait()
+        self.assertEqual(clock.now, 10)
+
 
 if __name__ == '__main__':
     logging.basicConfig(stream=sys.stderr)
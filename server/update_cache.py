@@ -3,57 +3,142 @@ The script is part of the TRON (ToRainOrNot) weather widget.
 
 Scraps weather data for locations configured in config.locations_to_cache
 and sinoptik.location_ids (popular Bulgarian weather website) and
-stores the data in local json files. These files are
-consumed by mobile and web client.
+stores the data in local json files, along with their gzip (and brotli)
+compressed copies. These files are consumed by mobile and web client.
 
 Should be executed daily by cron job at any time after 00:01.
+
+Run with --profile to find out why a run was slow, and with --dry-run
+to profile it offline against pages saved earlier with --record.
 """
 import os
+import argparse
+import shutil
 import datetime
 import json
+import tempfile
+from contextlib import nullcontext
+import requests
 import config
+import profiling
+from precompress import write_precompressed
 from providers.base import BaseWeatherProvider
 # Importing all weather providers that should be used,
 # to give them a chance to register their classes
 from providers.sinoptik import SinoptikProvider
+from providers import utils
+from providers.utils import CircuitOpenError, RecordedPageMissingError
+
+
+def latest_cached_file(dir):
+    """
+    Find the most recent json file cached for a location.
+    :param dir: Directory with cached data for the location
+    :return: Path to file or None, if nothing has been cached yet
+    """
+    files = sorted(f for f in os.listdir(dir) if f.endswith('.json'))
+    return os.path.join(dir, files[-1]) if files else None
+
+
+def serve_stale_forecast(dir, filename):
+    """
+    Copy the most recent forecast of a location under today's filename, so
+    clients still get data while the website is down. A .stale marker is
+    written next to it, so the next run downloads the data again.
+    :param dir: Directory with cached data for the location
+    :param filename: Path to today's json file
+    :return: Path to the copied forecast or None, if nothing has been cached yet
+    """
+    latest = latest_cached_file(dir)
+    if not latest:
+        return None
 
+    if latest != filename:
+        # Keep the time of the original file, so it is known how old the data is
+        shutil.copy2(latest, filename)
+        write_precompressed(filename)
+    open(filename + '.stale', 'w').close()
+    return latest
 
-for location in config.locations_to_cache:
-    """Cache data for each location in a separate file"""
 
-    location_name = location["location"]
-    provider_id = location["provider"]
+def update_cache(cache_dir, force=False):
+    """
+    Download and cache weather data for each location in config.locations_to_cache.
+    :param cache_dir: Directory where cached data should be stored
+    :param force: Download data even if it has already been cached today,
+                  e.g. to record or replay pages
+    """
+    for location in config.locations_to_cache:
+        """Cache data for each location in a separate file"""
 
-    now = datetime.datetime.now()
+        location_name = location["location"]
+        provider_id = location["provider"]
 
-    # Prepare directory
-    dir = os.path.join(
-        config.cache_dir,
-        location_name,
-    )
-    os.makedirs(dir, 0o755, True)
+        now = datetime.datetime.now()
 
-    # Use current date as filename, to prevent using stale data
-    filename = os.path.join(
-        dir,
-        '%s.json' % now.strftime('%Y%m%d'),
-    )
+        # Prepare directory
+        dir = os.path.join(
+            cache_dir,
+            location_name,
+        )
+        os.makedirs(dir, 0o755, True)
 
-    # If data for today has already been downloaded, do nothing
-    if os.path.isfile(filename):
-        print('Data for %s on %s already exists' % (location_name, now.strftime('%d.%m.%Y')))
-        continue
+        # Use current date as filename, to prevent using stale data
+        filename = os.path.join(
+            dir,
+            '%s.json' % now.strftime('%Y%m%d'),
+        )
 
-    # Find provider by ID or location name
-    if provider_id:
-        provider = BaseWeatherProvider.find_provider(provider_id=provider_id)
-    else:
-        provider = BaseWeatherProvider.find_provider(location_name=location_name)
+        # If data for today has already been downloaded, do nothing.
+        # Stale data, copied from an earlier day, is downloaded again.
+        stale_marker = filename + '.stale'
+        if os.path.isfile(filename) and not os.path.isfile(stale_marker) and not force:
+            print('Data for %s on %s already exists' % (location_name, now.strftime('%d.%m.%Y')))
+            continue
 
-    # Download data for next 24 hours
-    data = provider.download_data(location_name=location_name)
+        # Find provider by ID or location name
+        with profiling.stage('lookup'):
+            if provider_id:
+                provider = BaseWeatherProvider.find_provider(provider_id=provider_id)
+            else:
+                provider = BaseWeatherProvider.find_provider(location_name=location_name)
 
-    # Write data as json file
-    with open(filename, 'w+') as f:
-        json.dump(data, f)
+        # Download data for next 24 hours. If the website is down, keep serving
+        # the last cached forecast and try again on next run.
+        try:
+            data = provider.download_data(location_name=location_name, use_cache=False)
+        except (CircuitOpenError, requests.RequestException, RecordedPageMissingError) as e:
+            print('Could not download data for %s: %s' % (location_name, e))
+            if serve_stale_forecast(dir, filename):
+                print('Serving last cached forecast as %s until next run' % filename)
+            continue
+
+        # Write data as json file
+        with profiling.stage('write'):
+            with open(filename, 'w+') as f:
+                json.dump(data, f)
+            write_precompressed(filename)
+            if os.path.isfile(stale_marker):
+                os.remove(stale_marker)
         print('Cached data for %s on %s to file %s' % (location_name, now.strftime('%d.%m.%Y'), filename))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cache weather data for configured locations.")
+    parser.add_argument('--profile', nargs='?', const='update_cache.pstats', metavar='FILE',
+                        help="profile the run and save pstats dump to FILE (default: %(const)s)")
+    parser.add_argument('--memory', action='store_true',
+                        help="with --profile, also trace memory allocations (slows down the run)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="read pages from config.recorded_pages_dir instead of downloading "
+                             "them and write data to a temporary directory")
+    parser.add_argument('--record', action='store_true',
+                        help="save downloaded pages to config.recorded_pages_dir for later --dry-run")
+    args = parser.parse_args()
+
+    utils.replay_pages = args.dry_run
+    utils.record_pages = args.record
+
+    with tempfile.TemporaryDirectory() if args.dry_run else nullcontext(config.cache_dir) as cache_dir:
+        with profiling.profile(args.profile, args.memory) if args.profile else nullcontext():
+            update_cache(cache_dir, force=args.dry_run or args.record)